@@ -12,79 +12,100 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import os
-import requests
-import json
-
-from mcp.server.fastmcp import FastMCP
+import asyncio
+import datetime
+import functools
+import threading
+import weakref
+from typing import TYPE_CHECKING
+
+import httpx
+import ijson
+from cachetools import TTLCache
+
+from mcp.server.fastmcp import Context, FastMCP
 from mcp.shared.exceptions import McpError
 from mcp.types import ErrorData, INTERNAL_ERROR, INVALID_PARAMS
 
-import google.auth
-import google.auth.transport.requests
-from google.api_core.client_options import ClientOptions
-from google.cloud import discoveryengine_v1 as discoveryengine
-from google.protobuf.json_format import MessageToDict
+# The Google Cloud SDKs pull in large generated protobuf modules. They are
+# imported on first use so the server starts quickly when an MCP host spawns
+# a fresh process per session.
+if TYPE_CHECKING:
+    from google.cloud import discoveryengine_v1 as discoveryengine
 
 mcp = FastMCP("agentspace")
 
-def get_auth_header():
-  creds, _ = google.auth.default()
-  creds.refresh(google.auth.transport.requests.Request())
-
-  headers = {
-      'Authorization': f'Bearer {creds.token}',
-      'Content-Type': 'application/json; charset=UTF-8'
-  }
-  return headers
-
-@mcp.tool()
-def get_search_response(
-    # project_id: str,
-    # location: str,
-    # engine_id: str,
-    search_query: str,
-    # prompt_preamble: str | None = None,
-) -> str:
-    """Retrieves search results from using the Discovery Engine Python SDK.
-
-    Args:
-        search_query: The search query string.
-
-    Returns:
-        A list of JSON objects containing the search results.
-        This list may be empty if no results are found.
-    """
-    try:
-
-        # Args:
-        #     project_id: The Google Cloud project ID.
-        #     location: The location of the Discovery Engine (e.g., "global", "us-central1").
-        #     engine_id: The ID of the Discovery Engine.
-        #     prompt_preamble: The preamble to use for search summaries.
-        project_id = "the-foo-bar"
-        location = "global"
-        engine_id = "cymbal-bank_1746202630648"
-        prompt_preamble = None
-
-        #  For more information, refer to:
-        # https://cloud.google.com/generative-ai-app-builder/docs/locations#specify_a_multi-region_for_your_data_store
-        client_options = (
-            ClientOptions(api_endpoint=f"{location}-discoveryengine.googleapis.com")
-            if location != "global"
-            else None
-        )
-
-        # Create a client
-        client = discoveryengine.SearchServiceClient(client_options=client_options)
+# _PROJECT_ID: The Google Cloud project ID.
+# _LOCATION: The location of the Discovery Engine (e.g., "global", "us-central1").
+# _ENGINE_ID: The ID of the Discovery Engine.
+_PROJECT_ID = "the-foo-bar"
+_LOCATION = "global"
+_ENGINE_ID = "cymbal-bank_1746202630648"
+_ASSISTANT_ID = "default_assistant"
+
+# Resource names only depend on the constants above, so they are formatted once.
+_ENGINE_PATH = f"projects/{_PROJECT_ID}/locations/{_LOCATION}/collections/default_collection/engines/{_ENGINE_ID}"
+# The full resource name of the search app serving config
+_SEARCH_SERVING_CONFIG = f"{_ENGINE_PATH}/servingConfigs/default_config"
+# The full resource name of the Search serving config used by AnswerQuery
+_ANSWER_SERVING_CONFIG = f"{_ENGINE_PATH}/servingConfigs/default_serving_config"
+# https://cloud.google.com/generative-ai-app-builder/docs/reference/rest/v1alpha/projects.locations.collections.engines.assistants/streamAssist
+_STREAM_ASSIST_URL = f"https://discoveryengine.googleapis.com/v1alpha/{_ENGINE_PATH}/assistants/{_ASSISTANT_ID}:streamAssist"
+
+# Clients are cached per location so the underlying gRPC channel (and its
+# TLS session) is reused across tool calls instead of being rebuilt each time.
+# The async clients let concurrent tool calls overlap their network latency
+# instead of blocking the event loop.
+_SEARCH_CLIENTS: dict[str, "discoveryengine.SearchServiceAsyncClient"] = {}
+_ANSWER_CLIENTS: dict[str, "discoveryengine.ConversationalSearchServiceAsyncClient"] = {}
+
+# Repeated queries within a short window are answered from memory instead of
+# going back to Discovery Engine. Keep the TTL short to avoid stale results.
+# The caches are only touched from the event loop, so they need no lock.
+_SEARCH_CACHE = TTLCache(maxsize=128, ttl=60)
+_ANSWER_CACHE = TTLCache(maxsize=128, ttl=60)
+_DEEP_RESEARCH_CACHE = TTLCache(maxsize=32, ttl=60)
+
+# Identical queries that arrive while a lookup is still running wait on that
+# lookup instead of issuing their own RPC. Different queries already run
+# concurrently over the shared gRPC channel.
+_SEARCH_INFLIGHT: dict[str, asyncio.Task] = {}
+_ANSWER_INFLIGHT: dict[str, asyncio.Task] = {}
+
+# Deep Research session names, keyed by the connected MCP client session. The
+# client session is held weakly, so a conversation lasts exactly as long as
+# its client stays connected. Like the caches above this is only touched from
+# the event loop.
+_SESSIONS: "weakref.WeakKeyDictionary[object, str]" = weakref.WeakKeyDictionary()
+
+# Every RPC gets a deadline so a stuck backend call cannot hang the server.
+# Transient failures are retried with exponential backoff within 60 seconds.
+_RPC_TIMEOUT = 30.0
+
+@functools.cache
+def _rpc_retry():
+    """Builds the retry policy shared by all Discovery Engine RPCs."""
+    from google.api_core.retry import if_transient_error
+    from google.api_core.retry_async import AsyncRetry
+
+    return AsyncRetry(
+        predicate=if_transient_error,
+        initial=0.5,
+        maximum=8.0,
+        multiplier=2.0,
+        deadline=60.0,
+    )
 
-        # The full resource name of the search app serving config
-        serving_config = f"projects/{project_id}/locations/{location}/collections/default_collection/engines/{engine_id}/servingConfigs/default_config"
+@functools.cache
+def _search_specs():
+    """Builds the query-independent `SearchRequest` fields once."""
+    from google.cloud import discoveryengine_v1 as discoveryengine
 
+    return dict(
         # Optional - only supported for unstructured data: Configuration options for search.
         # Refer to the `ContentSearchSpec` reference for all supported fields:
         # https://cloud.google.com/python/docs/reference/discoveryengine/latest/google.cloud.discoveryengine_v1.types.SearchRequest.ContentSearchSpec
-        content_search_spec = discoveryengine.SearchRequest.ContentSearchSpec(
+        content_search_spec=discoveryengine.SearchRequest.ContentSearchSpec(
             # For information about snippets, refer to:
             # https://cloud.google.com/generative-ai-app-builder/docs/snippets
             snippet_spec=discoveryengine.SearchRequest.ContentSearchSpec.SnippetSpec(
@@ -98,7 +119,7 @@ def get_search_response(
                 ignore_adversarial_query=True,
                 ignore_non_summary_seeking_query=True,
                 model_prompt_spec=discoveryengine.SearchRequest.ContentSearchSpec.SummarySpec.ModelPromptSpec(
-                    preamble=prompt_preamble
+                    preamble=None
                 ),
                 model_spec=discoveryengine.SearchRequest.ContentSearchSpec.SummarySpec.ModelSpec(
                     version="stable",
@@ -111,75 +132,377 @@ def get_search_response(
                 max_extractive_answer_count=2,
                 return_extractive_segment_score=True,
             ),
-        )
+        ),
+        query_expansion_spec=discoveryengine.SearchRequest.QueryExpansionSpec(
+            condition=discoveryengine.SearchRequest.QueryExpansionSpec.Condition.AUTO,
+        ),
+        spell_correction_spec=discoveryengine.SearchRequest.SpellCorrectionSpec(
+            mode=discoveryengine.SearchRequest.SpellCorrectionSpec.Mode.AUTO
+        ),
+    )
 
-        # Refer to the `SearchRequest` reference for all supported fields:
-        # https://cloud.google.com/python/docs/reference/discoveryengine/latest/google.cloud.discoveryengine_v1.types.SearchRequest
-        request = discoveryengine.SearchRequest(
-            serving_config=serving_config,
-            query=search_query,
-            page_size=10,
-            content_search_spec=content_search_spec,
-            query_expansion_spec=discoveryengine.SearchRequest.QueryExpansionSpec(
-                condition=discoveryengine.SearchRequest.QueryExpansionSpec.Condition.AUTO,
+@functools.cache
+def _answer_specs():
+    """Builds the query-independent `AnswerQueryRequest` fields once."""
+    from google.cloud import discoveryengine_v1 as discoveryengine
+
+    return dict(
+        # Optional: Options for query phase
+        # The `query_understanding_spec` below includes all available query phase options.
+        # For more details, refer to https://cloud.google.com/generative-ai-app-builder/docs/reference/rest/v1/QueryUnderstandingSpec
+        query_understanding_spec=discoveryengine.AnswerQueryRequest.QueryUnderstandingSpec(
+            query_rephraser_spec=discoveryengine.AnswerQueryRequest.QueryUnderstandingSpec.QueryRephraserSpec(
+                disable=False,  # Optional: Disable query rephraser
+                max_rephrase_steps=1,  # Optional: Number of rephrase steps
+            ),
+            # Optional: Classify query types
+            query_classification_spec=discoveryengine.AnswerQueryRequest.QueryUnderstandingSpec.QueryClassificationSpec(
+                types=[
+                    discoveryengine.AnswerQueryRequest.QueryUnderstandingSpec.QueryClassificationSpec.Type.ADVERSARIAL_QUERY,
+                    discoveryengine.AnswerQueryRequest.QueryUnderstandingSpec.QueryClassificationSpec.Type.NON_ANSWER_SEEKING_QUERY,
+                ]  # Options: ADVERSARIAL_QUERY, NON_ANSWER_SEEKING_QUERY or both
+            ),
+        ),
+        # Optional: Options for answer phase
+        # The `answer_generation_spec` below includes all available query phase options.
+        # For more details, refer to https://cloud.google.com/generative-ai-app-builder/docs/reference/rest/v1/AnswerGenerationSpec
+        answer_generation_spec=discoveryengine.AnswerQueryRequest.AnswerGenerationSpec(
+            ignore_adversarial_query=False,  # Optional: Ignore adversarial query
+            ignore_non_answer_seeking_query=False,  # Optional: Ignore non-answer seeking query
+            ignore_low_relevant_content=False,  # Optional: Return fallback answer when content is not relevant
+            model_spec=discoveryengine.AnswerQueryRequest.AnswerGenerationSpec.ModelSpec(
+                model_version="gemini-2.0-flash-001/answer_gen/v1",  # Optional: Model to use for answer generation
+                # model_version="gemini-2.0-flash/answer_gen/v2",  # Optional: Model to use for answer generation
             ),
-            spell_correction_spec=discoveryengine.SearchRequest.SpellCorrectionSpec(
-                mode=discoveryengine.SearchRequest.SpellCorrectionSpec.Mode.AUTO
+            prompt_spec=discoveryengine.AnswerQueryRequest.AnswerGenerationSpec.PromptSpec(
+                preamble="Give a detailed answer.",  # Optional: Natural language instructions for customizing the answer.
             ),
+            include_citations=True,  # Optional: Include citations in the response
+            answer_language_code="en",  # Optional: Language code of the answer
+        ),
+    )
+
+# Keepalive pings stop the gRPC connection from going cold between sparse
+# tool calls, so the next call does not pay for a new HTTP/2 + TLS handshake.
+# Pings are sent every 5 minutes, the shortest interval gRPC servers accept by
+# default on an idle connection; pinging more often gets the connection
+# closed with GOAWAY too_many_pings.
+# The unlimited message sizes match what the generated transports set on
+# their own channels; large SearchResponses exceed gRPC's 4 MiB default.
+_GRPC_CHANNEL_OPTIONS = [
+    ("grpc.max_send_message_length", -1),
+    ("grpc.max_receive_message_length", -1),
+    ("grpc.keepalive_time_ms", 300000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+
+def _get_api_endpoint(location):
+    #  For more information, refer to:
+    # https://cloud.google.com/generative-ai-app-builder/docs/locations#specify_a_multi-region_for_your_data_store
+    if location == "global":
+        return "discoveryengine.googleapis.com"
+    return f"{location}-discoveryengine.googleapis.com"
+
+def _create_transport(transport_cls, location, credentials):
+    host = _get_api_endpoint(location)
+    channel = transport_cls.create_channel(
+        f"{host}:443", credentials=credentials, options=_GRPC_CHANNEL_OPTIONS
+    )
+    return transport_cls(host=host, channel=channel)
+
+async def _get_search_client(location):
+    client = _SEARCH_CLIENTS.get(location)
+    if client is None:
+        credentials = await _get_shared_credentials()
+        from google.cloud import discoveryengine_v1 as discoveryengine
+        from google.cloud.discoveryengine_v1.services.search_service.transports import (
+            SearchServiceGrpcAsyncIOTransport,
         )
 
-        response = client.search(request)
+        # Another call may have built the client while credentials loaded
+        client = _SEARCH_CLIENTS.get(location)
+        if client is None:
+            client = discoveryengine.SearchServiceAsyncClient(
+                transport=_create_transport(
+                    SearchServiceGrpcAsyncIOTransport, location, credentials
+                )
+            )
+            _SEARCH_CLIENTS[location] = client
+    return client
+
+async def _get_answer_client(location):
+    client = _ANSWER_CLIENTS.get(location)
+    if client is None:
+        credentials = await _get_shared_credentials()
+        from google.cloud import discoveryengine_v1 as discoveryengine
+        from google.cloud.discoveryengine_v1.services.conversational_search_service.transports import (
+            ConversationalSearchServiceGrpcAsyncIOTransport,
+        )
+
+        # Another call may have built the client while credentials loaded
+        client = _ANSWER_CLIENTS.get(location)
+        if client is None:
+            client = discoveryengine.ConversationalSearchServiceAsyncClient(
+                transport=_create_transport(
+                    ConversationalSearchServiceGrpcAsyncIOTransport,
+                    location,
+                    credentials,
+                )
+            )
+            _ANSWER_CLIENTS[location] = client
+    return client
+
+# A single client keeps the TLS connection to discoveryengine.googleapis.com
+# alive between streamAssist calls. With HTTP/2, concurrent calls are
+# multiplexed over that one connection instead of opening one each.
+_HTTP = httpx.AsyncClient(
+    http2=True,
+    timeout=httpx.Timeout(60.0, connect=5.0),
+    limits=httpx.Limits(max_connections=16, max_keepalive_connections=8),
+)
+
+# Application Default Credentials are loaded once and the access token is
+# reused until it is close to expiring, instead of being refetched per call.
+# A background task refreshes the token a few minutes before it expires, so
+# tool calls normally find a valid token and never wait on the OAuth exchange.
+# The same credentials back the REST calls and the gRPC channels of the search
+# and answer clients, so that one refresher covers all three tools.
+_AUTH_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+_CREDS = None
+_AUTH_REQUEST = None
+_CREDS_LOCK = threading.Lock()
+_TOKEN_REFRESH_SKEW = datetime.timedelta(seconds=60)
+_BACKGROUND_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+_BACKGROUND_RETRY_SECONDS = 30
+_TOKEN_REFRESHER = None
+
+def _utcnow():
+  # google-auth stores the expiry as a naive UTC datetime
+  return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+def _token_needs_refresh(creds, skew):
+  if not creds.valid:
+    return True
+  if creds.expiry is None:
+    return False
+  return creds.expiry - _utcnow() < skew
+
+def _refresh_credentials(skew):
+  """Loads ADC on first use and refreshes the token if it expires within `skew`.
+
+  Returns:
+      A `(token, expiry)` tuple for the current access token.
+  """
+  global _CREDS, _AUTH_REQUEST
+  with _CREDS_LOCK:
+    if _CREDS is None:
+      import google.auth
+      import google.auth.transport.requests
+
+      # Request the scope up front so the gRPC channels use these
+      # credentials as-is instead of a separately refreshed scoped copy
+      _CREDS, _ = google.auth.default(scopes=_AUTH_SCOPES)
+      _AUTH_REQUEST = google.auth.transport.requests.Request()
+    if _token_needs_refresh(_CREDS, skew):
+      _CREDS.refresh(_AUTH_REQUEST)
+    return _CREDS.token, _CREDS.expiry
+
+async def _refresh_token_periodically():
+  """Keeps the cached access token refreshed ahead of its expiry."""
+  while True:
+    try:
+      _, expiry = await asyncio.to_thread(
+          _refresh_credentials, _BACKGROUND_REFRESH_MARGIN
+      )
+    except Exception:
+      # Callers still refresh on demand and report the error
+      delay = _BACKGROUND_RETRY_SECONDS
+    else:
+      if expiry is None:
+        # Credentials without an expiry never need refreshing
+        return
+      delay = (expiry - _utcnow() - _BACKGROUND_REFRESH_MARGIN).total_seconds()
+    await asyncio.sleep(max(delay, _BACKGROUND_RETRY_SECONDS))
+
+def _ensure_token_refresher():
+  """Starts the background token refresher on the running event loop once."""
+  global _TOKEN_REFRESHER
+  if _TOKEN_REFRESHER is None:
+    _TOKEN_REFRESHER = asyncio.create_task(_refresh_token_periodically())
+
+async def _get_shared_credentials():
+  """Returns the shared ADC credentials, loading them off the event loop."""
+  _ensure_token_refresher()
+  await asyncio.to_thread(_refresh_credentials, _TOKEN_REFRESH_SKEW)
+  return _CREDS
+
+def get_auth_header():
+  token, _ = _refresh_credentials(_TOKEN_REFRESH_SKEW)
+
+  headers = {
+      'Authorization': f'Bearer {token}',
+      'Content-Type': 'application/json; charset=UTF-8',
+      # Google APIs only compress responses for clients that ask for gzip
+      # both in Accept-Encoding and in the User-Agent.
+      'Accept-Encoding': 'gzip',
+      'User-Agent': 'mcp-agentspace (gzip)',
+  }
+  return headers
+
+async def _get_cached(cache, inflight, key, fetch):
+    """Returns `cache[key]`, awaiting `fetch(key)` to fill it on a miss.
+
+    Concurrent misses for the same key share a single `fetch` call. Failed
+    fetches raise in every waiter and are not cached.
+    """
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    task = inflight.get(key)
+    if task is None:
+        async def fetch_and_store():
+            value = await fetch(key)
+            cache[key] = value
+            return value
+
+        task = asyncio.create_task(fetch_and_store())
+        inflight[key] = task
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+
+    # Shield the shared task so one cancelled caller does not cancel the others
+    return await asyncio.shield(task)
+
+async def _do_search(search_query):
+    from google.cloud import discoveryengine_v1 as discoveryengine
+
+    # Reuse the cached client for this location
+    client = await _get_search_client(_LOCATION)
+
+    # Refer to the `SearchRequest` reference for all supported fields:
+    # https://cloud.google.com/python/docs/reference/discoveryengine/latest/google.cloud.discoveryengine_v1.types.SearchRequest
+    request = discoveryengine.SearchRequest(
+        serving_config=_SEARCH_SERVING_CONFIG,
+        query=search_query,
+        page_size=10,
+        **_search_specs(),
+    )
+
+    response = await client.search(request, retry=_rpc_retry(), timeout=_RPC_TIMEOUT)
+
+    # proto-plus exposes the Struct as a mapping and only converts the values
+    # that are actually read, so there is no need to reach into `_pb`.
+    document = response.results[0].document
+    extractive_answers = document.derived_struct_data["extractive_answers"]
+
+    # return response
+    return extractive_answers[0]["content"]
+    # return response.results
+
+@mcp.tool()
+async def get_search_response(
+    # project_id: str,
+    # location: str,
+    # engine_id: str,
+    search_query: str,
+    # prompt_preamble: str | None = None,
+) -> str:
+    """Retrieves search results from using the Discovery Engine Python SDK.
+
+    Args:
+        search_query: The search query string.
 
-        document_dict = MessageToDict(
-        response.results[0].document._pb, preserving_proto_field_name=True
+    Returns:
+        A list of JSON objects containing the search results.
+        This list may be empty if no results are found.
+    """
+    try:
+        return await _get_cached(
+            _SEARCH_CACHE, _SEARCH_INFLIGHT, search_query, _do_search
         )
 
-        # return response
-        return document_dict["derived_struct_data"]["extractive_answers"][0]["content"]
-        # return response.results
-    
     except ValueError as e:
         raise McpError(ErrorData(INVALID_PARAMS, str(e))) from e
     except Exception as e:
         raise McpError(ErrorData(INTERNAL_ERROR, f"Unexpected error: {str(e)}")) from e
 
-def process_deep_research_response(response):
+async def _iter_json_array(chunks):
+    """Yields the elements of a top-level JSON array as its bytes arrive.
+
+    Malformed or truncated upstream data raises `ijson.JSONError`, which the
+    tools report as an internal error rather than as invalid parameters.
+
+    Args:
+        chunks: An async iterable of byte chunks that together form a JSON array.
+
+    Returns:
+        An async generator over the decoded array elements.
+    """
+    items = ijson.sendable_list()
+    parser = ijson.items_coro(items, "item", use_float=True)
+    async for chunk in chunks:
+        parser.send(chunk)
+        for item in items:
+            yield item
+        del items[:]
+    parser.close()
+    for item in items:
+        yield item
+
+def _iter_reply_texts(row):
+    """Yields the grounded reply texts of one streamed Deep Research row."""
+    answer = row.get('answer') or {}
+    for reply in answer.get('replies') or ():
+        content = (reply.get('groundedContent') or {}).get('content') or {}
+        model_text = content.get('text')
+        if model_text:
+            yield model_text
+
+async def _record_session(rows, client_session):
+    """Yields the streamed rows, storing the first session name seen in them."""
+    recorded = False
+    async for row in rows:
+        if not recorded:
+            session = (row.get('sessionInfo') or {}).get('session')
+            if session:
+                _SESSIONS[client_session] = session
+                recorded = True
+        yield row
+
+async def process_deep_research_response(rows):
     """Process the response from the Deep Research API.
 
     Args:
-        response: The response object from the Deep Research API.
+        rows: An async iterable over the streamed response objects from the Deep Research API.
 
     Returns:
         A string containing the processed response.
     """
 
-    text_json = json.loads(response.text)
-    raw_text = ''
-    raw_text = "# Reserach Plan\n"
-    for row in text_json:
-        try:
-            replies = row['answer']['replies']
-            for reply in replies:
-                model_text = reply['groundedContent']['content']['text']
-                raw_text += model_text + '\n'
-        except:
-            # print(row)
-            continue
-    return raw_text
+    # Rows without an answer (e.g. session info) simply contribute nothing
+    parts = ["# Research Plan"]
+    async for row in rows:
+        parts.extend(_iter_reply_texts(row))
+    parts.append("")
+    return "\n".join(parts)
 
 # Get reports with Deep Research
 @mcp.tool()
-def get_deep_research_response(
+async def get_deep_research_response(
     # project_id: str,
     # location: str,
     # engine_id: str,
     query: str,
+    ctx: Context,
     start_new_session: bool = False,
 ) -> str:
     """Deep Research is a Premade by Google agent for users who need to gather, analyze, and understand internal and external information.
 
     Args:
         query: The query string users can chat with the research agent.
+        ctx: The MCP request context, used to track the session per client.
         start_new_session: Whether to start a new session or continue an existing one.
 
     Returns:
@@ -187,16 +510,7 @@ def get_deep_research_response(
     """
 
     try:
-        project_id = "the-foo-bar"
-        location = "global"
-        engine_id = "cymbal-bank_1746202630648"
-        assistant_id  = 'default_assistant' 
-
-        headers = get_auth_header()
-        headers["X-Goog-User-Project"] = project_id
-
         # https://cloud.google.com/agentspace/agentspace-enterprise/docs/research-assistant#rest
-        # https://cloud.google.com/generative-ai-app-builder/docs/reference/rest/v1alpha/projects.locations.collections.engines.assistants/streamAssist
         stream_assist_request= {
             "query": {
                 "text": query
@@ -209,26 +523,49 @@ def get_deep_research_response(
             # },
         }
 
-        if start_new_session == False:
-            session = os.environ.get("SESSION")
+        cache_key = None
+        client_session = ctx.session
+        if not start_new_session:
+            session = _SESSIONS.get(client_session)
             if session:
-                stream_assist_request["session"] = os.environ.get("SESSION")
-
-        url =  f"https://discoveryengine.googleapis.com/v1alpha/projects/{project_id}/locations/{location}/collections/default_collection/engines/{engine_id}/assistants/{assistant_id}:streamAssist"
-        result = requests.post(
-            url = url,
-            data=json.dumps(stream_assist_request),
+                stream_assist_request["session"] = session
+            else:
+                # Without a session the report only depends on the query
+                cache_key = query
+
+        if cache_key is not None:
+            markdown_text = _DEEP_RESEARCH_CACHE.get(cache_key)
+            if markdown_text is not None:
+                return markdown_text
+
+        _ensure_token_refresher()
+        # Loading or refreshing the token is blocking I/O, keep it off the
+        # event loop
+        headers = await asyncio.to_thread(get_auth_header)
+        headers["X-Goog-User-Project"] = _PROJECT_ID
+
+        async with _HTTP.stream(
+            "POST",
+            _STREAM_ASSIST_URL,
+            json=stream_assist_request,
             headers=headers,
-            )
-            #stream=True)
+            ) as result:
+            result.raise_for_status()
+
+            # Parse the streamed JSON array element by element instead of
+            # buffering the whole body and decoding it in one go.
+            rows = _iter_json_array(result.aiter_bytes())
 
-        result_json = json.loads(result.text)    
-        if start_new_session == True:
-            session = result_json[0]['sessionInfo']['session']
-            # Set an environment variable
-            os.environ['SESSION'] = session
+            if start_new_session:
+                # Pick the session up from the rows as they are processed
+                # rather than decoding any of the response a second time.
+                _SESSIONS.pop(client_session, None)
+                rows = _record_session(rows, client_session)
 
-        markdown_text = process_deep_research_response(result)
+            markdown_text = await process_deep_research_response(rows)
+
+        if cache_key is not None:
+            _DEEP_RESEARCH_CACHE[cache_key] = markdown_text
 
         return markdown_text
     
@@ -237,7 +574,7 @@ def get_deep_research_response(
     except Exception as e:
         raise McpError(ErrorData(INTERNAL_ERROR, f"Unexpected error: {str(e)}")) from e
 
-def get_answer_response(
+async def _do_answer(
     # project_id: str,
     # location: str,
     # engine_id: str,
@@ -250,75 +587,39 @@ def get_answer_response(
     specifying a location-specific endpoint for the API.
 
     Args:
-        project_id: The Google Cloud project ID.
-        location: The location of the Discovery Engine (e.g., "global", "us-central1").
-        engine_id: The ID of the Discovery Engine.
         query: The query string.
 
     Returns:
         A `discoveryengine.AnswerQueryResponse` object containing the answer,
         citations, and other related information.
     """
-    client_options = (
-        ClientOptions(api_endpoint=f"{location}-discoveryengine.googleapis.com")
-        if location != "global"
-        else None
-    )
-
-    # Create a client
-    client = discoveryengine.ConversationalSearchServiceClient(
-        client_options=client_options
-    )
+    from google.cloud import discoveryengine_v1 as discoveryengine
 
-    # The full resource name of the Search serving config
-    serving_config = f"projects/{project_id}/locations/{location}/collections/default_collection/engines/{engine_id}/servingConfigs/default_serving_config"
-
-    # Optional: Options for query phase
-    # The `query_understanding_spec` below includes all available query phase options.
-    # For more details, refer to https://cloud.google.com/generative-ai-app-builder/docs/reference/rest/v1/QueryUnderstandingSpec
-    query_understanding_spec = discoveryengine.AnswerQueryRequest.QueryUnderstandingSpec(
-        query_rephraser_spec=discoveryengine.AnswerQueryRequest.QueryUnderstandingSpec.QueryRephraserSpec(
-            disable=False,  # Optional: Disable query rephraser
-            max_rephrase_steps=1,  # Optional: Number of rephrase steps
-        ),
-        # Optional: Classify query types
-        query_classification_spec=discoveryengine.AnswerQueryRequest.QueryUnderstandingSpec.QueryClassificationSpec(
-            types=[
-                discoveryengine.AnswerQueryRequest.QueryUnderstandingSpec.QueryClassificationSpec.Type.ADVERSARIAL_QUERY,
-                discoveryengine.AnswerQueryRequest.QueryUnderstandingSpec.QueryClassificationSpec.Type.NON_ANSWER_SEEKING_QUERY,
-            ]  # Options: ADVERSARIAL_QUERY, NON_ANSWER_SEEKING_QUERY or both
-        ),
-    )
-
-    # Optional: Options for answer phase
-    # The `answer_generation_spec` below includes all available query phase options.
-    # For more details, refer to https://cloud.google.com/generative-ai-app-builder/docs/reference/rest/v1/AnswerGenerationSpec
-    answer_generation_spec = discoveryengine.AnswerQueryRequest.AnswerGenerationSpec(
-        ignore_adversarial_query=False,  # Optional: Ignore adversarial query
-        ignore_non_answer_seeking_query=False,  # Optional: Ignore non-answer seeking query
-        ignore_low_relevant_content=False,  # Optional: Return fallback answer when content is not relevant
-        model_spec=discoveryengine.AnswerQueryRequest.AnswerGenerationSpec.ModelSpec(
-            model_version="gemini-2.0-flash-001/answer_gen/v1",  # Optional: Model to use for answer generation
-            # model_version="gemini-2.0-flash/answer_gen/v2",  # Optional: Model to use for answer generation
-        ),
-        prompt_spec=discoveryengine.AnswerQueryRequest.AnswerGenerationSpec.PromptSpec(
-            preamble="Give a detailed answer.",  # Optional: Natural language instructions for customizing the answer.
-        ),
-        include_citations=True,  # Optional: Include citations in the response
-        answer_language_code="en",  # Optional: Language code of the answer
-    )
+    client = await _get_answer_client(_LOCATION)
 
     # Initialize request argument(s)
     request = discoveryengine.AnswerQueryRequest(
-        serving_config=serving_config,
+        serving_config=_ANSWER_SERVING_CONFIG,
         query=discoveryengine.Query(text=query),
         session=None,  # Optional: include previous session ID to continue a conversation
-        query_understanding_spec=query_understanding_spec,
-        answer_generation_spec=answer_generation_spec,
+        **_answer_specs(),
     )
 
     # Make the request
-    response = client.answer_query(request)
+    response = await client.answer_query(
+        request, retry=_rpc_retry(), timeout=_RPC_TIMEOUT
+    )
 
     # return response
-    return response.answer.answer_text
\ No newline at end of file
+    return response.answer.answer_text
+
+async def get_answer_response(query: str) -> str:
+    """Retrieves an answer from the Discovery Engine, reusing recent answers.
+
+    Args:
+        query: The query string.
+
+    Returns:
+        The answer text.
+    """
+    return await _get_cached(_ANSWER_CACHE, _ANSWER_INFLIGHT, query, _do_answer)
\ No newline at end of file